@@ -0,0 +1,46 @@
+"""
+Shared Anthropic API clients.
+
+Each script used to instantiate its own anthropic client, which builds a
+fresh httpx client with its own TCP connection pool and TLS context.
+Memoizing one client per process means every request in a run (and in
+pipeline runs that import these scripts) rides the same keep-alive
+connections, amortizing DNS resolution and TLS handshakes — the same
+reasoning as reusing a DB connection pool.
+"""
+
+import asyncio
+import functools
+import weakref
+
+import anthropic
+
+
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """Return the process-wide synchronous Anthropic client."""
+    return anthropic.Anthropic(max_retries=3)
+
+
+# The async client's httpx connections bind to the event loop they
+# first run on, and each script main() opens its own loop via
+# asyncio.run — a process-wide singleton would hand the second run
+# connections tied to the first, already-closed loop ("Event loop is
+# closed"). So memoize per loop; weak keys let an entry die with its
+# loop instead of accumulating.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Return the Anthropic async client for the running event loop.
+
+    Must be called from within a running loop (i.e. inside the coroutine
+    passed to asyncio.run), so repeat calls in one loop share a client
+    without leaking it across loops.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = anthropic.AsyncAnthropic(max_retries=3)
+        _async_clients[loop] = client
+    return client
@@ -6,6 +6,85 @@ merging, and scoring. They are extracted verbatim from the original
 notebook (llm_recsys_notebook.ipynb).
 """
 
+import hashlib
+import re
+
+# Compiled once at import — the scoring loop parses one response per
+# item (or per batch), so per-call re.compile overhead adds up.
+_TIER_RE = re.compile(r"Tier:\s*(\d)")
+_RAT_RE = re.compile(r"Rationale:\s*(.+)", re.DOTALL)
+_BATCH_TIER_RE = re.compile(
+    r"\[(\d+)\]\s*Tier:\s*(\d)\s*\n\s*Rationale:\s*(.+?)(?=\n\s*\[\d+\]|\Z)",
+    re.DOTALL,
+)
+
+
+def parse_tier_rationale(text):
+    """Parse a `Tier: X / Rationale: ...` response. Returns (tier, rationale)."""
+    tier_match = _TIER_RE.search(text)
+    tier = int(tier_match.group(1)) if tier_match else None
+
+    rationale_match = _RAT_RE.search(text)
+    rationale = rationale_match.group(1).strip() if rationale_match else text
+
+    return tier, rationale
+
+
+def parse_scoring_response(text):
+    """Parse a batched scoring response into per-item results.
+
+    Expects the `[index] Tier: X / Rationale: ...` format emitted under
+    SCORING_BATCH_SYSTEM_PROMPT; one finditer pass extracts every block.
+
+    Returns:
+        list of {"index": int, "tier": int, "rationale": str}.
+    """
+    return [
+        {
+            "index": int(m.group(1)),
+            "tier": int(m.group(2)),
+            "rationale": m.group(3).strip(),
+        }
+        for m in _BATCH_TIER_RE.finditer(text)
+    ]
+
+
+def dedupe_image_blocks(content):
+    """Replace repeated base64 images in a content list with text pointers.
+
+    The same hero image can appear under several items in one request
+    (shared product imagery, or an item listed in both signal sets).
+    Re-embedding the bytes inflates the payload and the billed input
+    tokens, so after the first occurrence each duplicate becomes a short
+    "[Same image as ...]" text block. Keyed by a hash of the base64
+    payload; url-source blocks are left alone (deduped server-side).
+
+    Mutates and returns `content`.
+    """
+    seen = {}
+    label = None
+    for i, block in enumerate(content):
+        if block.get("type") == "text":
+            # Track which item the following images belong to
+            text = block["text"].lstrip()
+            if text.startswith("Item ") or text.startswith("["):
+                label = text.split("\n", 1)[0].split(" — ")[0]
+            continue
+        if block.get("type") != "image" or block["source"].get("type") != "base64":
+            continue
+        key = hashlib.blake2b(
+            block["source"]["data"].encode("ascii"), digest_size=8,
+        ).hexdigest()
+        if key in seen:
+            content[i] = {
+                "type": "text",
+                "text": f"[Same image as already shown for {seen[key]}]",
+            }
+        else:
+            seen[key] = label or "an earlier item"
+    return content
+
+
 # ── Phase 2A: Positive-Only Synthesis ────────────────────────────────
 
 POSITIVE_ONLY_SYSTEM_PROMPT = """You are a style analyst specializing in inferring latent
@@ -55,7 +134,7 @@ def build_positive_only_user_content(items, build_item_content_blocks_fn):
             "embellishment/details, price behavior, and overall aesthetic."
         ),
     })
-    return content
+    return dedupe_image_blocks(content)
 
 
 # ── Phase 2B: Contrastive Synthesis ──────────────────────────────────
@@ -113,7 +192,7 @@ def build_contrastive_user_content(pos_items, neg_items, build_item_content_bloc
             "and ANTI-PREFERENCES (with specific negative-item evidence)."
         ),
     })
-    return content
+    return dedupe_image_blocks(content)
 
 
 # ── Merge Prompt ─────────────────────────────────────────────────────
@@ -139,13 +218,21 @@ def build_merge_system_prompt(n):
 def build_merge_user_content(syntheses):
     """Build the user message for merging N agent syntheses.
 
+    Returns a plain string, not a list of content blocks: the merge turn
+    is text-only, and the API accepts raw string content directly, so
+    callers should pass it as `content=<string>` and skip the
+    `[{"type": "text", ...}]` wrapper (and its serialization overhead
+    on ~50 KB-per-agent payloads).
+
+    Assembled with a single join (never cumulative `+=`), so the cost
+    stays linear in the total synthesis text.
+
     Args:
         syntheses: list of strings, each an agent's synthesis output.
     """
-    agent_texts = "\n\n---\n\n".join(
-        [f"## Agent {i+1} Analysis\n\n{s}" for i, s in enumerate(syntheses)]
+    return "\n\n---\n\n".join(
+        f"## Agent {i+1} Analysis\n\n{s}" for i, s in enumerate(syntheses)
     )
-    return agent_texts
 
 
 # ── Phase 3: Scoring ─────────────────────────────────────────────────
@@ -167,9 +254,78 @@ Be calibrated: Tier 1 should be rare (~5-10% of items). Most items should be Tie
 Analyze the IMAGE carefully — visual match matters more than text description match."""
 
 
+SCORING_BATCH_SYSTEM_PROMPT = """You are a recommendation engine. You have a detailed user
+preference profile and must score a numbered batch of new items on how well they match.
+
+Score each item on this 4-tier scale:
+- Tier 1 (Strong Match): High confidence the user would click to explore this item
+- Tier 2 (Moderate Match): Aligns with several preferences but has notable gaps
+- Tier 3 (Weak Match): One or two alignment points, but overall not a fit
+- Tier 4 (No Match): Conflicts with core preferences or hits anti-preferences
+
+Items are numbered with [index] markers. For EVERY item, in order, emit exactly one block:
+[index] Tier: [1-4]
+Rationale: [1-2 sentences citing specific preference dimensions]
+
+Do not skip or merge items — one block per [index].
+Be calibrated: Tier 1 should be rare (~5-10% of items). Most items should be Tier 3-4.
+Analyze each IMAGE carefully — visual match matters more than text description match."""
+
+
+def build_batch_scoring_user_content(items, preference_brief, blocks_per_item):
+    """Build the user message for scoring a batch of items in one call.
+
+    Packing several items per request amortizes the system prompt and the
+    preference brief across the batch, cutting API round-trips ~B-fold on
+    the scoring phase. Keep batches modest (5-10 items) so the response
+    fits comfortably in the max_tokens budget.
+
+    Args:
+        items: list of item dicts, each with at least 'name' and 'price'.
+        preference_brief: the merged preference profile text.
+        blocks_per_item: list (parallel to items) of content-block lists
+                         from build_item_content_blocks.
+    """
+    content = []
+    content.append({
+        "type": "text",
+        "text": f"## User Preference Profile\n\n{preference_brief}",
+        # Identical across every scoring request — let the server reuse
+        # its KV cache for the profile prefix instead of reprocessing it
+        "cache_control": {"type": "ephemeral"},
+    })
+    content.append({
+        "type": "text",
+        "text": f"\n## Items to Score ({len(items)} items)",
+    })
+    for i, item_blocks in enumerate(blocks_per_item):
+        for block in item_blocks:
+            if block["type"] == "text":
+                # Reuse the full item description from
+                # build_item_content_blocks (name/price plus any
+                # Visual:/Details: lines), tagged with the [i] marker
+                # the response format keys on
+                content.append({"type": "text", "text": f"\n[{i}] {block['text']}"})
+            else:
+                content.append(block)
+    content.append({
+        "type": "text",
+        "text": (
+            "\nScore every item above. Respond with one block per item, in order:\n"
+            "[index] Tier: [1-4]\nRationale: [your reasoning]"
+        ),
+    })
+    return dedupe_image_blocks(content)
+
+
 def build_scoring_user_content(item, preference_brief, item_content_blocks):
     """Build the user message for scoring a single item.
 
+    The preference brief is marked with cache_control so Anthropic's
+    prompt caching reuses the (potentially thousands of tokens) profile
+    prefix across the per-item requests — cached input tokens are billed
+    at ~10% of the normal rate and shorten time-to-first-token.
+
     Args:
         item: dict with at least 'name' and 'price'.
         preference_brief: the merged preference profile text.
@@ -179,6 +335,7 @@ def build_scoring_user_content(item, preference_brief, item_content_blocks):
     content.append({
         "type": "text",
         "text": f"## User Preference Profile\n\n{preference_brief}",
+        "cache_control": {"type": "ephemeral"},
     })
     content.append({
         "type": "text",
@@ -26,13 +26,16 @@ Examples:
 """
 
 import argparse
-import json
 import sys
 from collections import Counter
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
+import numpy as np
+
+from _utils import load_json
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -65,16 +68,42 @@ def parse_args():
 
 def load_scores(path):
     """Load scores JSON. Returns list of {id, name, tier, rationale}."""
-    with open(path) as f:
-        return json.load(f)
+    return load_json(path)
 
 
 def load_labels(path):
-    """Load user labels JSON. Returns dict {item_id_str: bool}."""
-    with open(path) as f:
-        data = json.load(f)
-    # Normalize keys to strings
-    return {str(k): bool(v) for k, v in data.items()}
+    """Load user labels JSON.
+
+    Returns dict {item_id: bool}. When every key is numeric the dict is
+    int-keyed (ints hash faster and avoid a str() allocation per lookup
+    in compute_metrics); otherwise keys are normalized to strings.
+    """
+    data = load_json(path)
+    try:
+        return {int(k): bool(v) for k, v in data.items()}
+    except (ValueError, TypeError):
+        return {str(k): bool(v) for k, v in data.items()}
+
+
+def scores_to_soa(scores):
+    """Convert a list of score dicts to parallel arrays (AoS -> SoA).
+
+    Repeated dict[str] field access dominates metric computation on
+    large score lists; converting once to columnar arrays makes every
+    later pass a cheap array operation.
+
+    Returns:
+        dict with keys: "id" (np.ndarray of str), "tier" (np.int8 array,
+        0 for unparsed/out-of-range tiers), "name" (list of str).
+    """
+    return {
+        "id": np.array([str(s["id"]) for s in scores]),
+        "tier": np.array(
+            [s["tier"] if s.get("tier") in (1, 2, 3, 4) else 0 for s in scores],
+            dtype=np.int8,
+        ),
+        "name": [s.get("name", "") for s in scores],
+    }
 
 
 def compute_metrics(scores, labels, name=""):
@@ -82,67 +111,98 @@ def compute_metrics(scores, labels, name=""):
 
     A "recommendation" is defined as Tier 1 or Tier 2.
 
+    Args:
+        scores: list of score dicts, or a columnar dict from scores_to_soa.
+        labels: dict {item_id_str: bool} from load_labels.
+        name: label for this scoring run in the report.
+
     Returns:
         dict with keys: tp, fp, fn, tn, precision, recall, lift,
         base_rate, n_recs, n_total, tier_calibration, name.
     """
+    soa = scores if isinstance(scores, dict) else scores_to_soa(scores)
+    all_ids = soa["id"]
+    all_tiers = soa["tier"]
+    all_names = soa["name"]
+
+    # Join with labels: keep only scored items the user labeled.
+    # load_labels int-keys the dict when ids are numeric; mirror that here.
+    int_keys = bool(labels) and isinstance(next(iter(labels)), int)
+    keep = []
+    clicked_list = []
+    for idx in range(len(all_ids)):
+        key = all_ids[idx]
+        if int_keys:
+            try:
+                key = int(key)
+            except ValueError:
+                pass
+        lab = labels.get(key)
+        if lab is not None:
+            keep.append(idx)
+            clicked_list.append(lab)
+
+    if not keep:
+        return None
+
+    n_total = len(keep)
+    keep = np.asarray(keep, dtype=np.intp)
+    tiers = all_tiers[keep]
+    clicked = np.asarray(clicked_list, dtype=bool)
+
+    # Per-item rows for the report (error analysis, agreement)
     results = []
-    for item in scores:
-        item_id = str(item["id"])
-        tier = item.get("tier")
-        clicked = labels.get(item_id)
-        if clicked is None:
-            # Item not in labels — skip
-            continue
+    for pos, idx in enumerate(keep):
+        t = int(tiers[pos])
         results.append({
-            "id": item_id,
-            "name": item.get("name", ""),
-            "tier": tier,
-            "is_rec": tier in (1, 2),
-            "user_clicked": clicked,
+            "id": all_ids[idx],
+            "name": all_names[idx],
+            "tier": t if t else None,
+            "is_rec": t in (1, 2),
+            "user_clicked": bool(clicked[pos]),
         })
 
-    if not results:
-        return None
+    # Fused contingency histogram: pack (tier, clicked) into one key so
+    # a single bincount pass yields every cell; all stats below are
+    # constant-index lookups (h[2t] = tier t skipped, h[2t+1] = clicked)
+    key = tiers.astype(np.int32) * 2 + clicked
+    h = np.bincount(key, minlength=10)
 
-    n_total = len(results)
-    n_clicked = sum(1 for r in results if r["user_clicked"])
+    n_clicked = int(h[1::2].sum())
     base_rate = n_clicked / n_total if n_total > 0 else 0
 
-    recs = [r for r in results if r["is_rec"]]
-    non_recs = [r for r in results if not r["is_rec"]]
-
-    tp = sum(1 for r in recs if r["user_clicked"])
-    fp = sum(1 for r in recs if not r["user_clicked"])
-    fn = sum(1 for r in non_recs if r["user_clicked"])
-    tn = sum(1 for r in non_recs if not r["user_clicked"])
+    tp = int(h[1 * 2 + 1] + h[2 * 2 + 1])
+    fp = int(h[1 * 2 + 0] + h[2 * 2 + 0])
+    fn = n_clicked - tp
+    tn = n_total - n_clicked - fp
 
     precision = tp / (tp + fp) if (tp + fp) > 0 else 0
     recall = tp / (tp + fn) if (tp + fn) > 0 else 0
     lift = precision / base_rate if base_rate > 0 else 0
 
-    # Tier calibration
+    # Tier calibration rows straight from the histogram
     tier_cal = {}
     for t in [1, 2, 3, 4]:
-        tier_items = [r for r in results if r["tier"] == t]
-        n = len(tier_items)
-        clicks = sum(1 for r in tier_items if r["user_clicked"])
+        n = int(h[t * 2] + h[t * 2 + 1])
+        clicks = int(h[t * 2 + 1])
         tier_cal[t] = {
             "n_items": n,
             "n_clicked": clicks,
             "click_rate": clicks / n if n > 0 else 0,
         }
 
-    # False positives and false negatives for error analysis
-    false_positives = [r for r in recs if not r["user_clicked"]]
-    false_negatives = [r for r in non_recs if r["user_clicked"]]
+    is_rec = (tiers == 1) | (tiers == 2)
+
+    # Error-analysis rows picked out by the boolean masks
+    false_positives = [results[i] for i in np.nonzero(is_rec & ~clicked)[0]]
+    false_negatives = [results[i] for i in np.nonzero(~is_rec & clicked)[0]]
 
     return {
         "name": name,
         "n_total": n_total,
         "n_clicked": n_clicked,
         "base_rate": base_rate,
-        "n_recs": len(recs),
+        "n_recs": tp + fp,
         "tp": tp,
         "fp": fp,
         "fn": fn,
@@ -271,15 +331,19 @@ def format_report(metrics, alt_metrics=None):
     # ── Error Analysis ───────────────────────────────────────────
     section(f"FALSE POSITIVES: {metrics.get('name', 'Primary')} — Recommended but user skipped")
     if metrics["false_positives"]:
-        for r in metrics["false_positives"]:
-            lines.append(f"  {r['id']}: {r['name']} (Tier {r['tier']})")
+        lines.extend(
+            f"  {r['id']}: {r['name']} (Tier {r['tier']})"
+            for r in metrics["false_positives"]
+        )
     else:
         lines.append("  (none)")
 
     section(f"FALSE NEGATIVES: {metrics.get('name', 'Primary')} — User clicked but not recommended")
     if metrics["false_negatives"]:
-        for r in metrics["false_negatives"]:
-            lines.append(f"  {r['id']}: {r['name']} (Tier {r['tier']})")
+        lines.extend(
+            f"  {r['id']}: {r['name']} (Tier {r['tier']})"
+            for r in metrics["false_negatives"]
+        )
     else:
         lines.append("  (none)")
 
@@ -298,7 +362,7 @@ def main():
 
     # Determine name for primary scoring
     primary_name = Path(args.scores).stem
-    metrics = compute_metrics(scores, labels, name=primary_name)
+    metrics = compute_metrics(scores_to_soa(scores), labels, name=primary_name)
     if metrics is None:
         print("ERROR: No items matched between scores and labels.", file=sys.stderr)
         sys.exit(1)
@@ -308,7 +372,7 @@ def main():
     if args.scores_alt:
         alt_scores = load_scores(args.scores_alt)
         alt_name = Path(args.scores_alt).stem
-        alt_metrics = compute_metrics(alt_scores, labels, name=alt_name)
+        alt_metrics = compute_metrics(scores_to_soa(alt_scores), labels, name=alt_name)
         print(f"Loaded {len(alt_scores)} alt scores from {args.scores_alt}", file=sys.stderr)
 
     report = format_report(metrics, alt_metrics)
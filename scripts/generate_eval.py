@@ -16,94 +16,24 @@ Example:
 """
 
 import argparse
+import html
 import json
-import random
+import os
 import sys
 from pathlib import Path
 
-sys.path.insert(0, str(Path(__file__).parent))
-
-from _utils import _log
-
-
-def parse_args():
-    parser = argparse.ArgumentParser(
-        description="Generate a blind evaluation HTML for user labeling.",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-    )
-    parser.add_argument(
-        "--scores", required=True, metavar="PATH",
-        help="JSON file from score_catalog.py (array of {id, name, tier, ...}).",
-    )
-    parser.add_argument(
-        "--images-dir", default=None, metavar="DIR",
-        help=(
-            "Base directory containing item images. "
-            "Images are referenced as <images-dir>/<item_id>.jpg in the HTML. "
-            "If not provided, items are shown without images."
-        ),
-    )
-    parser.add_argument(
-        "--catalog", default=None, metavar="PATH",
-        help=(
-            "Optional: original catalog JSON with image URLs/paths. "
-            "Used to find image references if --images-dir is not sufficient."
-        ),
-    )
-    parser.add_argument(
-        "--output", required=True, metavar="PATH",
-        help="Output path for the HTML file.",
-    )
-    parser.add_argument(
-        "--seed", type=int, default=None,
-        help="Random seed for shuffle reproducibility.",
-    )
-    return parser.parse_args()
-
-
-def find_image_src(item_id, images_dir, catalog_lookup):
-    """Find the best image source for an item.
-
-    Returns a string suitable for an HTML <img src="..."> attribute,
-    or None if no image is found.
-    """
-    if images_dir:
-        for ext in [".jpg", ".jpeg", ".png", ".webp"]:
-            candidate = Path(images_dir) / f"{item_id}{ext}"
-            if candidate.exists():
-                return str(candidate)
-        # Try with _alt for a second image
-        for ext in [".jpg", ".jpeg", ".png", ".webp"]:
-            candidate = Path(images_dir) / f"{item_id}_alt{ext}"
-            if candidate.exists():
-                return str(candidate)
-
-    # Fall back to catalog data
-    if catalog_lookup and item_id in catalog_lookup:
-        cat_item = catalog_lookup[item_id]
-        for key in ["hero_img_path", "img_path", "hero_img_url", "img_url", "hero_img"]:
-            if key in cat_item and cat_item[key]:
-                return cat_item[key]
-
-    return None
+import numpy as np
 
+sys.path.insert(0, str(Path(__file__).parent))
 
-def generate_html(scored_items, images_dir, catalog_lookup, seed=None):
-    """Generate the blind evaluation HTML string and shuffle key.
+from _utils import dump_json, load_json, _log
 
-    Returns:
-        (html_string, shuffle_key_list)
-    """
-    # Shuffle
-    indexed = list(enumerate(scored_items))
-    if seed is not None:
-        random.seed(seed)
-    random.shuffle(indexed)
 
-    total = len(scored_items)
+# Page chrome and the per-item card as module-level templates: parsed
+# once at import, filled via str.format per page/item, instead of
+# re-building multi-kilobyte f-strings inside the generation loop.
 
-    html_parts = []
-    html_parts.append(f"""<!DOCTYPE html>
+_PAGE_HEADER_TMPL = """<!DOCTYPE html>
 <html><head><meta charset="utf-8"><title>Blind Evaluation</title>
 <style>
   body {{ font-family: system-ui, -apple-system, sans-serif; max-width: 800px;
@@ -144,46 +74,20 @@ def generate_html(scored_items, images_dir, catalog_lookup, seed=None):
   for you to copy.</p>
 </div>
 <p id="progress">0 / {total} evaluated</p>
-""")
-
-    shuffle_key = []
-
-    for display_pos, (orig_idx, item) in enumerate(indexed):
-        item_id = item.get("id", f"item_{orig_idx}")
-        item_name = item.get("name", "Unknown Item")
-        shuffle_key.append({"display_pos": display_pos, "id": item_id})
+"""
 
-        # Find image(s)
-        img_html = ""
-        img_src = find_image_src(str(item_id), images_dir, catalog_lookup)
-        if img_src:
-            img_html = f'<div><img src="{img_src}" onerror="this.style.display=\'none\'"></div>'
-
-            # Try a second image (_alt)
-            if images_dir:
-                for ext in [".jpg", ".jpeg", ".png", ".webp"]:
-                    alt_path = Path(images_dir) / f"{item_id}_alt{ext}"
-                    if alt_path.exists():
-                        img_html = (
-                            f'<div>'
-                            f'<img src="{img_src}" onerror="this.style.display=\'none\'">'
-                            f'<img src="{alt_path}" onerror="this.style.display=\'none\'">'
-                            f'</div>'
-                        )
-                        break
-
-        html_parts.append(f"""<div class="item" id="item-{display_pos}">
-  <div style="color:#999;font-size:12px">Item {display_pos + 1} of {total}</div>
+_ITEM_TMPL = """<div class="item" id="item-{pos}">
+  <div style="color:#999;font-size:12px">Item {pos1} of {total}</div>
   {img_html}
-  <div class="item-name">{item_name}</div>
+  <div class="item-name">{name}</div>
   <div class="buttons">
-    <button class="btn-click" onclick="record('{item_id}', true, this)">Would Explore</button>
-    <button class="btn-skip" onclick="record('{item_id}', false, this)">Skip</button>
+    <button class="btn-click" onclick="record({id_js}, true, this)">Would Explore</button>
+    <button class="btn-skip" onclick="record({id_js}, false, this)">Skip</button>
   </div>
 </div>
-""")
+"""
 
-    html_parts.append(f"""
+_PAGE_FOOTER_TMPL = """
 <div id="results" style="display:none">
   <h3>Evaluation Complete</h3>
   <p>Copy the JSON below and save it to a file (e.g., <code>labels.json</code>).
@@ -218,17 +122,169 @@ function copyResults() {{
   }});
 }}
 </script>
-</body></html>""")
+</body></html>"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Generate a blind evaluation HTML for user labeling.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--scores", required=True, metavar="PATH",
+        help="JSON file from score_catalog.py (array of {id, name, tier, ...}).",
+    )
+    parser.add_argument(
+        "--images-dir", default=None, metavar="DIR",
+        help=(
+            "Base directory containing item images. "
+            "Images are referenced as <images-dir>/<item_id>.jpg in the HTML. "
+            "If not provided, items are shown without images."
+        ),
+    )
+    parser.add_argument(
+        "--catalog", default=None, metavar="PATH",
+        help=(
+            "Optional: original catalog JSON with image URLs/paths. "
+            "Used to find image references if --images-dir is not sufficient."
+        ),
+    )
+    parser.add_argument(
+        "--output", required=True, metavar="PATH",
+        help="Output path for the HTML file.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None,
+        help="Random seed for shuffle reproducibility.",
+    )
+    return parser.parse_args()
+
+
+def build_image_index(images_dir):
+    """Scan images_dir once and map file stem -> path string.
+
+    Probing every candidate extension with Path.exists() costs up to 8
+    stat syscalls per item; one scandir pass makes each lookup an O(1)
+    dict hit regardless of how many extensions we accept.
+    """
+    index = {}
+    if images_dir:
+        try:
+            with os.scandir(images_dir) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        index[os.path.splitext(entry.name)[0]] = entry.path
+        except OSError:
+            pass
+    return index
+
 
-    return "".join(html_parts), shuffle_key
+def find_image_srcs(item_id, image_index, catalog_lookup):
+    """Find the image sources for an item in one pass.
+
+    Args:
+        item_id: item id string.
+        image_index: stem -> path dict from build_image_index.
+        catalog_lookup: optional {id: item} dict for fallback image keys.
+
+    Returns:
+        (primary, alt) — strings suitable for HTML <img src="...">
+        attributes, either of which may be None. The _alt image is
+        resolved here alongside the primary so generate_html doesn't
+        need a second lookup per item.
+    """
+    cat_item = catalog_lookup.get(item_id) if catalog_lookup else None
+    alt = image_index.get(f"{item_id}_alt") if image_index else None
+
+    # A catalog hero_img_path is authoritative — use it straight away,
+    # skipping the index lookup
+    if cat_item and cat_item.get("hero_img_path"):
+        return cat_item["hero_img_path"], alt
+
+    primary = image_index.get(item_id) if image_index else None
+
+    # Fall back to the catalog's remaining image keys
+    if primary is None and cat_item:
+        for key in ["img_path", "hero_img_url", "img_url", "hero_img"]:
+            if cat_item.get(key):
+                primary = cat_item[key]
+                break
+
+    # No primary at all: promote the _alt image rather than show nothing
+    if primary is None:
+        primary, alt = alt, None
+
+    return primary, alt
+
+
+def generate_html(scored_items, images_dir, catalog_lookup, out_fp, seed=None):
+    """Write the blind evaluation HTML to out_fp and return the shuffle key.
+
+    Writes incrementally — header, one chunk per item, footer — so peak
+    memory stays at one item's HTML rather than the whole page (which
+    for a 10k-item catalog would otherwise be buffered twice: the built
+    string plus the write).
+
+    Args:
+        scored_items: list of score dicts from score_catalog.py.
+        images_dir: optional directory of item images.
+        catalog_lookup: optional {id: item} dict for image fallback.
+        out_fp: writable text file object for the HTML.
+        seed: optional shuffle seed.
+
+    Returns:
+        shuffle_key_list
+    """
+    # Shuffle via an index permutation — no N-tuple list to allocate,
+    # and the Fisher-Yates loop runs in C instead of Python
+    perm = np.random.default_rng(seed).permutation(len(scored_items))
+
+    total = len(scored_items)
+    image_index = build_image_index(images_dir)
+
+    out_fp.write(_PAGE_HEADER_TMPL.format(total=total))
+
+    shuffle_key = []
+
+    for display_pos, orig_idx in enumerate(perm):
+        item = scored_items[orig_idx]
+        item_id = item.get("id", f"item_{orig_idx}")
+        item_name = item.get("name", "Unknown Item")
+        shuffle_key.append({"display_pos": display_pos, "id": item_id})
+
+        # Find image(s) — primary and _alt come back from one lookup.
+        # Paths/URLs are attribute-escaped like every other interpolation
+        img_html = ""
+        img_src, alt_path = find_image_srcs(str(item_id), image_index, catalog_lookup)
+        if img_src:
+            src = html.escape(img_src, quote=True)
+            img_html = f'<div><img src="{src}" onerror="this.style.display=\'none\'">'
+            if alt_path:
+                alt_src = html.escape(alt_path, quote=True)
+                img_html += f'<img src="{alt_src}" onerror="this.style.display=\'none\'">'
+            img_html += '</div>'
+
+        out_fp.write(_ITEM_TMPL.format(
+            pos=display_pos,
+            pos1=display_pos + 1,
+            total=total,
+            img_html=img_html,
+            name=html.escape(str(item_name)),
+            # JS string literal first (json.dumps handles quotes and
+            # backslashes), then attribute-escaped for the onclick=""
+            id_js=html.escape(json.dumps(str(item_id))),
+        ))
+
+    out_fp.write(_PAGE_FOOTER_TMPL.format(total=total))
+
+    return shuffle_key
 
 
 def main():
     args = parse_args()
 
     # Load scores
-    with open(args.scores) as f:
-        scored_items = json.load(f)
+    scored_items = load_json(args.scores)
     _log(f"Loaded {len(scored_items)} scored items from {args.scores}")
 
     # Optionally load catalog for image URLs
@@ -239,24 +295,22 @@ def main():
         catalog_lookup = {str(item.get("id", "")): item for item in cat_items}
         _log(f"Loaded catalog with {len(catalog_lookup)} items for image lookup")
 
-    # Generate HTML
-    html, shuffle_key = generate_html(
-        scored_items,
-        images_dir=args.images_dir,
-        catalog_lookup=catalog_lookup,
-        seed=args.seed,
-    )
-
-    # Save HTML
+    # Generate HTML, streaming straight to the output file
     output_path = Path(args.output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(html)
+    with open(output_path, "w") as f:
+        shuffle_key = generate_html(
+            scored_items,
+            images_dir=args.images_dir,
+            catalog_lookup=catalog_lookup,
+            out_fp=f,
+            seed=args.seed,
+        )
     _log(f"Blind evaluation HTML saved to: {output_path}")
 
     # Save shuffle key
     key_path = output_path.with_name(output_path.stem + "_shuffle_key.json")
-    with open(key_path, "w") as f:
-        json.dump(shuffle_key, f, indent=2)
+    dump_json(shuffle_key, key_path)
     _log(f"Shuffle key saved to: {key_path}")
 
     _log(f"\nOpen {output_path} in a browser to start the evaluation.")
@@ -21,17 +21,15 @@ Examples:
 """
 
 import argparse
-import json
+import asyncio
 import os
 import sys
-import tempfile
 from pathlib import Path
 
 # Allow running from the scripts/ directory or the repo root
 sys.path.insert(0, str(Path(__file__).parent))
 
-import anthropic
-
+from _client import get_async_client
 from _prompts import (
     POSITIVE_ONLY_SYSTEM_PROMPT,
     CONTRASTIVE_SYSTEM_PROMPT,
@@ -40,7 +38,14 @@ from _prompts import (
     build_merge_system_prompt,
     build_merge_user_content,
 )
-from _utils import build_item_content_blocks, load_config, load_items, _log
+from _utils import (
+    build_item_content_blocks,
+    dump_json,
+    load_config,
+    load_items,
+    prefetch_images,
+    _log,
+)
 
 
 def parse_args():
@@ -84,6 +89,43 @@ def parse_args():
     return parser.parse_args()
 
 
+async def run_agents(client, model, system_prompt, user_content, num_agents,
+                     max_tokens, output_dir):
+    """Run the N independent synthesis agents concurrently.
+
+    The agents share one prompt and are fully independent. Agent 1 runs
+    alone first so its request writes the server-side prompt cache;
+    agents 2..N then fire concurrently via asyncio.gather and read the
+    cached prefix (cache entries aren't visible to requests already in
+    flight, so gathering all N at once would make every agent miss and
+    pay the cache-write surcharge). Latency is roughly two calls' worth
+    instead of N. Results come back in agent order (gather preserves
+    ordering).
+
+    Returns:
+        list of synthesis strings, one per agent.
+    """
+    async def run_agent(agent_num):
+        _log(f"Running agent {agent_num}/{num_agents} ...")
+        response = await client.messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            system=system_prompt,
+            messages=[{"role": "user", "content": user_content}],
+        )
+        synthesis = response.content[0].text
+
+        # Save individual agent output
+        agent_path = output_dir / f"agent{agent_num}_synthesis.md"
+        agent_path.write_text(synthesis)
+        _log(f"  Agent {agent_num} done — {len(synthesis)} chars → {agent_path}")
+        return synthesis
+
+    first = await run_agent(1)
+    rest = await asyncio.gather(*[run_agent(i + 2) for i in range(num_agents - 1)])
+    return [first, *rest]
+
+
 def main():
     args = parse_args()
     cfg = load_config(args.config)
@@ -94,8 +136,9 @@ def main():
     output_dir.mkdir(parents=True, exist_ok=True)
     images_dir = args.images_dir
 
-    # Create a temp dir for any downloaded images
-    temp_dir = tempfile.mkdtemp(prefix="llm_recsys_imgs_")
+    # No temp dir: any URL that does need downloading goes through the
+    # persistent image cache inside _download_image
+    temp_dir = None
 
     # Load items
     positive_items = load_items(args.positive)
@@ -112,7 +155,15 @@ def main():
     _log(f"Model: {model}")
     _log(f"Agents: {num_agents}")
 
-    # Helper to build content blocks with image resolution
+    # Fetch any remote images up front, in parallel
+    prefetch_images(
+        positive_items + (negative_items or []), temp_dir, images_dir=images_dir,
+    )
+
+    # Helper to build content blocks with image resolution. Invoked once
+    # per item while building user_content below; the same materialized
+    # content list is then shared by all N agent requests, so image
+    # resolution/encoding never repeats per agent.
     def item_blocks(item):
         return build_item_content_blocks(item, images_dir=images_dir, temp_dir=temp_dir)
 
@@ -126,40 +177,52 @@ def main():
         system_prompt = POSITIVE_ONLY_SYSTEM_PROMPT
         user_content = build_positive_only_user_content(positive_items, item_blocks)
 
-    # Initialize the Anthropic client
-    client = anthropic.Anthropic()
-
-    # ── Run N independent agents ─────────────────────────────────────
-    syntheses = []
-    for i in range(num_agents):
-        agent_num = i + 1
-        _log(f"Running agent {agent_num}/{num_agents} ...")
-        response = client.messages.create(
-            model=model,
+    # All N agent requests are byte-identical, so mark the system prompt
+    # and the end of the user content for server-side prompt caching:
+    # run_agents sequences agent 1 first to write the cache, then
+    # agents 2..N read it at ~10% input cost
+    system_prompt = [{
+        "type": "text",
+        "text": system_prompt,
+        "cache_control": {"type": "ephemeral"},
+    }]
+    user_content[-1]["cache_control"] = {"type": "ephemeral"}
+
+    async def _synthesize():
+        # One shared async client for agents + merge — fetched inside
+        # the coroutine so it is bound to this asyncio.run's loop
+        client = get_async_client()
+
+        # ── Run N independent agents concurrently ────────────────────
+        syntheses = await run_agents(
+            client, model, system_prompt, user_content, num_agents,
             max_tokens=6000 if is_contrastive else 4096,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_content}],
+            output_dir=output_dir,
         )
-        synthesis = response.content[0].text
-        syntheses.append(synthesis)
 
-        # Save individual agent output
-        agent_path = output_dir / f"agent{agent_num}_synthesis.md"
-        agent_path.write_text(synthesis)
-        _log(f"  Agent {agent_num} done — {len(synthesis)} chars → {agent_path}")
-
-    # ── Merge into consensus profile ─────────────────────────────────
-    _log(f"Merging {num_agents} agent outputs ...")
-    merge_system = build_merge_system_prompt(num_agents)
-    merge_user = build_merge_user_content(syntheses)
-
-    response = client.messages.create(
-        model=model,
-        max_tokens=6000,
-        system=merge_system,
-        messages=[{"role": "user", "content": merge_user}],
-    )
-    merged_brief = response.content[0].text
+        # ── Merge into consensus profile ─────────────────────────────
+        _log(f"Merging {num_agents} agent outputs ...")
+        merge_system = build_merge_system_prompt(num_agents)
+        merge_user = build_merge_user_content(syntheses)
+
+        # Stream the merge so tokens show up on stdout as the model
+        # generates them instead of after the full response lands —
+        # the merge's whole generation time disappears from perceived
+        # latency, and the printed text doubles as the return value
+        chunks = []
+        async with client.messages.stream(
+            model=model,
+            max_tokens=6000,
+            system=merge_system,
+            messages=[{"role": "user", "content": merge_user}],
+        ) as stream:
+            async for text in stream.text_stream:
+                print(text, end="", flush=True)
+                chunks.append(text)
+        print()
+        return "".join(chunks)
+
+    merged_brief = asyncio.run(_synthesize())
 
     brief_path = output_dir / "preference_brief.md"
     brief_path.write_text(merged_brief)
@@ -176,11 +239,9 @@ def main():
         "negative_source": args.negative,
     }
     meta_path = output_dir / "synthesis_meta.json"
-    with open(meta_path, "w") as f:
-        json.dump(meta, f, indent=2)
+    dump_json(meta, meta_path)
 
-    # Print the merged brief to stdout
-    print(merged_brief)
+    # The merged brief was already streamed to stdout during the merge
     _log(f"\nDone. Outputs in: {output_dir}")
 
 